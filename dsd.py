@@ -5,6 +5,7 @@ Streamlit Monthly Sales Dashboard — Brand Themed
 사용 방법
 1) 아래 패키지 설치 후 실행
    pip install --upgrade streamlit plotly pandas
+   (선택) pip install pyarrow  # 더 빠른 CSV 파싱
 2) 이 파일을 app.py 로 저장한 뒤 터미널에서 실행
    streamlit run app.py
 
@@ -12,7 +13,10 @@ CSV 헤더 예시: 월, 매출액, 전년동월, 증감률
 (영문 헤더도 허용: Month, Sales, LY, YoY)
 """
 
+import functools
+import hashlib
 import io
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
@@ -37,6 +41,7 @@ BRAND = {
     "orange": "#EC792C",  # Highlight
 }
 
+@functools.lru_cache(maxsize=256)
 def rgba(hex_color: str, a: float) -> str:
     hex_color = hex_color.lstrip('#')
     r = int(hex_color[0:2], 16)
@@ -44,6 +49,11 @@ def rgba(hex_color: str, a: float) -> str:
     b = int(hex_color[4:6], 16)
     return f"rgba({r},{g},{b},{a})"
 
+
+# 증감률 막대 색 (양수/음수)
+POS_COLOR = rgba(BRAND['yellow'], 0.9)
+NEG_COLOR = rgba(BRAND['dark'], 0.85)
+
 # ---------------------------
 # Header (심플한 흰 배경)
 # ---------------------------
@@ -83,84 +93,223 @@ KOR_KEYS = {
 }
 
 
-def pick_col(df: pd.DataFrame, keys):
-    for k in keys:
-        if k in df.columns:
-            return k
-    return None
-
-
-@st.cache_data(show_spinner=False)
-def load_csv(_file) -> pd.DataFrame:
-    df = pd.read_csv(_file)
-    return df
+# 이 이상의 포인트는 LTTB 로 줄여서 브라우저로 보낸다
+LTTB_THRESHOLD = 2000
+
+
+def lttb_indices(y: np.ndarray, n_out: int = LTTB_THRESHOLD) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets 다운샘플링. 남길 포인트의 인덱스를 반환."""
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    x = np.arange(n, dtype=float)
+    every = (n - 2) / (n_out - 2)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        # 다음 버킷의 평균점
+        nxt_start = int((i + 1) * every) + 1
+        nxt_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[nxt_start:nxt_end].mean()
+        avg_y = y[nxt_start:nxt_end].mean()
+        # 현재 버킷에서 삼각형 면적이 가장 큰 점 선택
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+
+def load_csv(file_bytes: bytes) -> pd.DataFrame:
+    # 재시도를 위해 업로드 바이트를 BytesIO 로 감싼다
+    buf = io.BytesIO(file_bytes)
+    try:
+        # pyarrow 멀티스레드 파서 (설치되어 있을 때)
+        return pd.read_csv(buf, engine="pyarrow", dtype_backend="pyarrow")
+    except Exception:
+        buf.seek(0)
+        return pd.read_csv(buf, engine="c", low_memory=False)
 
 
-@st.cache_data(show_spinner=False)
 def normalize_df(df_in: pd.DataFrame) -> pd.DataFrame:
-    df = df_in.copy()
+    # 공백 제거 및 문자열화 (원본 복사 없이 정리된 이름 → 원래 컬럼 매핑)
+    names = {str(c).strip(): c for c in df_in.columns}
 
-    # 공백 제거 및 문자열화
-    df.columns = [str(c).strip() for c in df.columns]
-
-    col_month = pick_col(df, KOR_KEYS["월"]) or "월"
-    col_sales = pick_col(df, KOR_KEYS["매출액"]) or "매출액"
-    col_ly = pick_col(df, KOR_KEYS["전년동월"]) or "전년동월"
-    col_yoy = pick_col(df, KOR_KEYS["증감률"]) or "증감률"
+    # 논리 컬럼 → 실제 헤더 (후보가 없으면 논리 이름 그대로 두고 아래에서 누락 처리)
+    resolved = {logical: next((k for k in cands if k in names), logical)
+                for logical, cands in KOR_KEYS.items()}
+    col_month, col_sales = resolved["월"], resolved["매출액"]
+    col_ly, col_yoy = resolved["전년동월"], resolved["증감률"]
 
     # 누락 컬럼 체크
-    missing = [c for c in [col_month, col_sales, col_ly, col_yoy] if c not in df.columns]
+    missing = [c for c in [col_month, col_sales, col_ly, col_yoy] if c not in names]
     if missing:
         raise ValueError(f"필수 컬럼을 찾을 수 없습니다: {missing}")
 
     out = pd.DataFrame()
-    out["월"] = df[col_month].astype(str).str.strip()
-
-    # 숫자 변환 (숫자/%, 천단위 기호 제거)
-    def to_num(s):
-        if pd.isna(s):
-            return None
-        s = str(s)
-        s = s.replace('%', '')
-        s = ''.join(ch for ch in s if ch.isdigit() or ch in ['-', '.'])
-        try:
-            return float(s)
-        except Exception:
-            return None
-
-    out["매출액"] = df[col_sales].map(to_num)
-    out["전년동월"] = df[col_ly].map(to_num)
-    out["증감률"] = df[col_yoy].map(
-        lambda x: float(str(x).replace('%', '')) if pd.notna(x) and str(x).strip() != '' else None)
-
-    # 월 파싱 및 정렬
-    out["_dt"] = pd.to_datetime(out["월"], format="%Y-%m", errors="coerce")
-    out = out.dropna(subset=["_dt", "매출액"]).copy()
-    out = out.sort_values("_dt").reset_index(drop=True)
+    out["월"] = df_in[names[col_month]].astype(str).str.strip()
+
+    # 숫자 변환 (숫자/%, 천단위 기호 제거) — 벡터화된 문자열 연산
+    # to_numeric 은 정수 문자열이면 int64 를 돌려주므로 항상 float64 로 맞춘다
+    out["매출액"] = pd.to_numeric(
+        df_in[names[col_sales]].astype(str).str.replace(r"[^\d\.\-]", "", regex=True),
+        errors="coerce").astype("float64")
+    out["전년동월"] = pd.to_numeric(
+        df_in[names[col_ly]].astype(str).str.replace(r"[^\d\.\-]", "", regex=True),
+        errors="coerce").astype("float64")
+    out["증감률"] = pd.to_numeric(
+        df_in[names[col_yoy]].astype(str).str.replace("%", "", regex=False).str.strip(),
+        errors="coerce").astype("float64")
+
+    # 월 파싱 및 정렬 (cache=True: 중복 월 문자열은 한 번만 파싱)
+    out["_dt"] = pd.to_datetime(out["월"], format="%Y-%m", errors="coerce", cache=True)
+    mask = out["_dt"].notna() & out["매출액"].notna()
+    order = out.loc[mask, "_dt"].to_numpy().argsort(kind="stable")
+    out = out.loc[mask].iloc[order].reset_index(drop=True)
 
     # 파생
     out["매출차액"] = (out["매출액"] - out["전년동월"]).fillna(0)
     out["누적매출"] = out["매출액"].cumsum()
 
+    # float32 로 줄여 메모리/Plotly 전송량 절감 (값이 float32 로 정확히 표현될 때만; 아니면 float64 유지)
+    for c in ["매출액", "전년동월", "증감률", "매출차액", "누적매출"]:
+        f32 = out[c].astype("float32")
+        if ((f32 == out[c]) | out[c].isna()).all():
+            out[c] = f32
+
     return out
 
+
+@st.cache_data(show_spinner=False)
+def _parse_and_normalize(file_bytes: bytes) -> pd.DataFrame:
+    # 업로드 바이트로 캐시 키를 잡아 위젯 조작(rerun) 시 재파싱/재정규화를 건너뛴다
+    return normalize_df(load_csv(file_bytes))
+
 # ---------------------------
 # Plotly layout helper with brand theme
 # ---------------------------
 
-def apply_brand_layout(fig: go.Figure, title: str, yaxis_title: str | None = None):
-    fig.update_layout(
-        title= dict(text=title, x=0.01, font=dict(color=BRAND['dark'], size=18)),
-        paper_bgcolor="#FFFFFF",
-        plot_bgcolor=rgba(BRAND['yellow'], 0.06),
-        font=dict(color=BRAND['dark']),
-        hovermode="x unified",
-        legend=dict(orientation='h', y=-0.2),
-        xaxis=dict(showgrid=True, gridcolor=rgba(BRAND['gray'], 0.15), zeroline=False),
-        yaxis=dict(title=yaxis_title, showgrid=True, gridcolor=rgba(BRAND['gray'], 0.15), zeroline=True,
-                   zerolinecolor=rgba(BRAND['gray'], 0.4)),
-        margin=dict(t=60, l=50, r=30, b=60),
-    )
+# 정적 레이아웃은 import 시 한 번만 구성 (차트별로는 제목/축 제목만 덧씌움).
+# template 로 등록하지 않는 이유: theme="streamlit" 이 layout.template 을 자체 테마로 덮어쓴다.
+BRAND_LAYOUT = dict(
+    paper_bgcolor="#FFFFFF",
+    plot_bgcolor=rgba(BRAND['yellow'], 0.06),
+    font=dict(color=BRAND['dark']),
+    legend=dict(orientation='h', y=-0.2),
+    # YYYY-MM 라벨은 모든 차트에서 날짜 축으로 고정 (빠진 달의 간격 유지)
+    xaxis=dict(type="date", showgrid=True, gridcolor=rgba(BRAND['gray'], 0.15), zeroline=False),
+    yaxis=dict(showgrid=True, gridcolor=rgba(BRAND['gray'], 0.15), zeroline=True,
+               zerolinecolor=rgba(BRAND['gray'], 0.4)),
+    margin=dict(t=60, l=50, r=30, b=60),
+)
+BRAND_TITLE_FONT = dict(color=BRAND['dark'], size=18)
+
+
+def apply_brand_layout(fig: go.Figure, title: str, yaxis_title: str | None = None,
+                       hovermode: str = "x unified"):
+    fig.update_layout(BRAND_LAYOUT, title=dict(text=title, x=0.01, font=BRAND_TITLE_FONT),
+                      yaxis_title=yaxis_title, hovermode=hovermode)
+
+# ---------------------------
+# Chart builders (데이터가 같으면 rerun 시 캐시된 Figure 재사용)
+# ---------------------------
+
+def frame_digest(df: pd.DataFrame) -> str:
+    # 업로드당 한 번만 계산하는 캐시 키. 빌더는 _df(언더스코어 → 해시 제외) 대신 이 키로 캐시된다
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()
+
+
+# cache_resource 는 모든 세션이 공유하고 자동 만료가 없으므로 빌더별 보관 개수를 제한
+FIG_CACHE_MAX_ENTRIES = 4
+
+# 이보다 행이 많으면 라인 차트를 WebGL(Scattergl) 로 렌더링 (적을 때는 SVG 가 더 선명)
+WEBGL_THRESHOLD = 200
+
+
+@st.cache_resource(show_spinner=False, max_entries=FIG_CACHE_MAX_ENTRIES)
+def build_fig1(_df: pd.DataFrame, key: str, has_ly: bool) -> go.Figure:
+    sales = _df["매출액"].to_numpy()
+    keep = lttb_indices(sales)
+    labels = _df["월"].to_numpy()[keep]
+    Trace = go.Scattergl if len(_df) > WEBGL_THRESHOLD else go.Scatter
+    fig = go.Figure()
+    fig.add_trace(Trace(x=labels, y=sales[keep], mode="lines+markers", name="당년 매출",
+                        line=dict(color=BRAND['orange'], width=3),
+                        marker=dict(color=BRAND['orange'], size=6)))
+    if has_ly:
+        fig.add_trace(Trace(x=labels, y=_df["전년동월"].to_numpy()[keep],
+                            mode="lines+markers", name="전년 매출",
+                            line=dict(color=BRAND['gray'], width=2, dash="dot"),
+                            marker=dict(color=BRAND['gray'], size=5)))
+    apply_brand_layout(fig, "월별 매출 추세", "매출액(원)")
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=FIG_CACHE_MAX_ENTRIES)
+def build_fig2(_df: pd.DataFrame, key: str, has_ly: bool) -> go.Figure:
+    labels = _df["월"].to_numpy()
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=labels, y=_df["매출액"].to_numpy(), name="당년",
+                         marker_color=rgba(BRAND['orange'], 0.95)))
+    if has_ly:
+        fig.add_trace(go.Bar(x=labels, y=_df["전년동월"].to_numpy(), name="전년",
+                             marker_color=rgba(BRAND['dark'], 0.9)))
+    fig.update_layout(barmode="group")
+    apply_brand_layout(fig, "전년 대비 월별 매출 비교", "매출액(원)")
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=FIG_CACHE_MAX_ENTRIES)
+def build_fig3(_df: pd.DataFrame, key: str) -> go.Figure:
+    labels = _df["월"].to_numpy()
+    yoy = _df["증감률"].to_numpy()
+    bar_colors = np.where(yoy >= 0, POS_COLOR, NEG_COLOR)
+    fig = go.Figure(go.Bar(x=labels, y=yoy, marker_color=bar_colors, name="증감률", hoverinfo="x+y"))
+    fig.add_hline(y=0, line_color=rgba(BRAND['gray'], 0.5))
+    apply_brand_layout(fig, "전년 대비 증감률", "증감률(%)", hovermode="closest")
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=FIG_CACHE_MAX_ENTRIES)
+def build_fig4(_df: pd.DataFrame, key: str) -> go.Figure:
+    labels = _df["월"].to_numpy()
+    cum = _df["누적매출"].to_numpy()
+    keep = lttb_indices(cum)
+    Trace = go.Scattergl if len(_df) > WEBGL_THRESHOLD else go.Scatter
+    fig = go.Figure()
+    fig.add_trace(Trace(
+        x=labels[keep], y=cum[keep], mode="lines",
+        line=dict(color=BRAND['dark'], width=2.8),
+        fill="tozeroy", fillcolor=rgba(BRAND['orange'], 0.25), name="누적 매출", hoverinfo="x+y"
+    ))
+    apply_brand_layout(fig, "누적 매출 추세", "누적 매출액(원)", hovermode="closest")
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=FIG_CACHE_MAX_ENTRIES)
+def build_fig5(_df: pd.DataFrame, key: str, max_idx: int, min_idx: int) -> go.Figure:
+    labels = _df["월"].to_numpy()
+    sales = _df["매출액"].to_numpy()
+    colors = np.full(len(sales), rgba(BRAND['beige'], 0.5), dtype=object)
+    colors[min_idx] = rgba(BRAND['dark'], 0.95)
+    colors[max_idx] = rgba(BRAND['orange'], 0.98)  # 최고·최저가 같으면 최고 색 우선
+    fig = go.Figure(go.Bar(x=labels, y=sales, marker_color=colors, hoverinfo="x+y"))
+    apply_brand_layout(fig, "월별 매출 (최고·최저 강조)", "매출액(원)", hovermode="closest")
+    return fig
+
+
+@st.cache_data(show_spinner=False)
+def to_csv_bytes(_df: pd.DataFrame, key: str) -> bytes:
+    # 다운로드용 CSV (Excel 호환 BOM 포함)
+    out = _df.drop(columns=["_dt"])
+    # float32 는 1.2e+07 처럼 출력되므로 float64 로 되돌린다 (float32 값은 정확하므로 손실 없음)
+    for c in out.select_dtypes("float32").columns:
+        out[c] = out[c].astype("float64")
+    return out.to_csv(index=False).encode("utf-8-sig")
 
 # ---------------------------
 # Main
@@ -170,15 +319,21 @@ if not file:
     st.stop()
 
 try:
-    df_raw = load_csv(file)
-    df = normalize_df(df_raw)
+    # 같은 업로드면 rerun 시 바이트 해시도 건너뛰고 세션에 보관한 결과 재사용
+    if st.session_state.get("_fid") != file.file_id:
+        st.session_state["_df"] = _parse_and_normalize(file.getvalue())
+        st.session_state["_df_key"] = frame_digest(st.session_state["_df"])
+        st.session_state["_fid"] = file.file_id
+    df, df_key = st.session_state["_df"], st.session_state["_df_key"]
 except Exception as e:
     st.error(f"데이터 로딩/정규화 중 오류: {e}")
     st.stop()
 
 # KPI 계산
-총매출 = float(df["매출액"].sum())
-평균매출 = float(df["매출액"].mean()) if len(df) else 0.0
+# float32 컬럼일 수 있으므로 합계/평균은 float64 로 누적
+매출_f64 = df["매출액"].to_numpy(dtype=np.float64)
+총매출 = float(매출_f64.sum())
+평균매출 = float(매출_f64.mean()) if len(df) else 0.0
 최고_idx = int(df["매출액"].idxmax())
 최저_idx = int(df["매출액"].idxmin())
 최고월, 최고매출 = df.loc[최고_idx, "월"], float(df.loc[최고_idx, "매출액"])
@@ -195,78 +350,29 @@ with c3:
 with c4:
     st.metric("최저 매출 월", f"{최저월}", help=f"{최저매출:,.0f} 원")
 
-# 공통 x축 라벨
-labels = df["월"].tolist()
-sales = df["매출액"].tolist()
-ly = df["전년동월"].tolist() if "전년동월" in df.columns else [None] * len(df)
-yoy = df["증감률"].tolist() if "증감률" in df.columns else [None] * len(df)
-cum = df["누적매출"].tolist()
+# 전년 데이터 유무
+has_ly = bool(df["전년동월"].notna().any())
 
 # 1) 월별 매출 추세
-fig1 = go.Figure()
-fig1.add_trace(go.Scatter(x=labels, y=sales, mode="lines+markers", name="당년 매출",
-                          line=dict(color=BRAND['orange'], width=3),
-                          marker=dict(color=BRAND['orange'], size=6)))
-if any(pd.notna(ly)):
-    fig1.add_trace(go.Scatter(x=labels, y=ly, mode="lines+markers", name="전년 매출",
-                              line=dict(color=BRAND['gray'], width=2, dash="dot"),
-                              marker=dict(color=BRAND['gray'], size=5)))
-apply_brand_layout(fig1, "월별 매출 추세", "매출액(원)")
-st.plotly_chart(fig1, use_container_width=True, theme="streamlit")
+st.plotly_chart(build_fig1(df, df_key, has_ly), use_container_width=True, theme="streamlit", key="fig1")
 
 # 2) 전년 대비 월별 매출 비교
-fig2 = go.Figure()
-fig2.add_trace(go.Bar(x=labels, y=sales, name="당년", marker_color=rgba(BRAND['orange'], 0.95)))
-if any(pd.notna(ly)):
-    fig2.add_trace(go.Bar(x=labels, y=ly, name="전년", marker_color=rgba(BRAND['dark'], 0.9)))
-fig2.update_layout(barmode="group")
-apply_brand_layout(fig2, "전년 대비 월별 매출 비교", "매출액(원)")
-st.plotly_chart(fig2, use_container_width=True, theme="streamlit")
+st.plotly_chart(build_fig2(df, df_key, has_ly), use_container_width=True, theme="streamlit", key="fig2")
 
 # 3) 전년 대비 증감률
-bar_colors = [
-    rgba(BRAND['yellow'], 0.9) if (v is not None and v >= 0)
-    else rgba(BRAND['dark'], 0.85)
-    for v in yoy
-]
-fig3 = go.Figure(go.Bar(x=labels, y=yoy, marker_color=bar_colors, name="증감률"))
-fig3.add_hline(y=0, line_color=rgba(BRAND['gray'], 0.5))
-apply_brand_layout(fig3, "전년 대비 증감률", "증감률(%)")
-st.plotly_chart(fig3, use_container_width=True, theme="streamlit")
+st.plotly_chart(build_fig3(df, df_key), use_container_width=True, theme="streamlit", key="fig3")
 
 # 4) 누적 매출
-fig4 = go.Figure()
-fig4.add_trace(go.Scatter(
-    x=labels, y=cum, mode="lines",
-    line=dict(color=BRAND['dark'], width=2.8),
-    fill="tozeroy", fillcolor=rgba(BRAND['orange'], 0.25), name="누적 매출"
-))
-apply_brand_layout(fig4, "누적 매출 추세", "누적 매출액(원)")
-st.plotly_chart(fig4, use_container_width=True, theme="streamlit")
-
-# 5) 최고·최저 강조
-max_idx = int(pd.Series(sales).idxmax())
-min_idx = int(pd.Series(sales).idxmin())
-
-def pick_color(i):
-    if i == max_idx:
-        return rgba(BRAND['orange'], 0.98)
-    if i == min_idx:
-        return rgba(BRAND['dark'], 0.95)
-    return rgba(BRAND['beige'], 0.5)
-
-fig5 = go.Figure(go.Bar(x=labels, y=sales, marker_color=[pick_color(i) for i in range(len(sales))]))
-apply_brand_layout(fig5, "월별 매출 (최고·최저 강조)", "매출액(원)")
-st.plotly_chart(fig5, use_container_width=True, theme="streamlit")
+st.plotly_chart(build_fig4(df, df_key), use_container_width=True, theme="streamlit", key="fig4")
+
+# 5) 최고·최저 강조 (KPI 에서 구한 인덱스 재사용)
+st.plotly_chart(build_fig5(df, df_key, 최고_idx, 최저_idx), use_container_width=True, theme="streamlit", key="fig5")
 
 # 데이터 다운로드
 with st.expander("📥 정규화된 데이터 다운로드"):
-    out_csv = df.drop(columns=["_dt"]).copy()
-    buff = io.BytesIO()
-    buff.write(out_csv.to_csv(index=False).encode("utf-8-sig"))
     st.download_button(
         label="CSV 다운로드",
-        data=buff.getvalue(),
+        data=to_csv_bytes(df, df_key),
         file_name="normalized_sales.csv",
         mime="text/csv",
     )